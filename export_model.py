@@ -0,0 +1,50 @@
+import os
+from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from transformers import AutoTokenizer
+
+# Constants
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+MODEL_CACHE_DIR = "model_cache"
+ONNX_MODEL_DIR = "onnx_model"
+ONNX_QUANTIZED_DIR = "onnx_model_int8"
+
+def main():
+    """
+    Exports the embedding model to ONNX, then quantizes it to int8 for
+    query-time encoding in main.py.
+    
+    The export step is equivalent to:
+        optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 --task feature-extraction onnx_model/
+    """
+    print("--- Starting ONNX Export ---")
+    
+    if not os.path.exists(MODEL_CACHE_DIR):
+        os.makedirs(MODEL_CACHE_DIR)
+    
+    print(f"Exporting '{EMBEDDING_MODEL_NAME}' to ONNX...")
+    model = ORTModelForFeatureExtraction.from_pretrained(
+        EMBEDDING_MODEL_NAME,
+        export=True,
+        cache_dir=MODEL_CACHE_DIR
+    )
+    tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL_NAME, cache_dir=MODEL_CACHE_DIR)
+    
+    model.save_pretrained(ONNX_MODEL_DIR)
+    tokenizer.save_pretrained(ONNX_MODEL_DIR)
+    print(f"FP32 model saved to '{ONNX_MODEL_DIR}'.")
+    
+    # Dynamic quantization is enough for a model this small and needs no calibration data
+    print("Quantizing to int8...")
+    quantizer = ORTQuantizer.from_pretrained(ONNX_MODEL_DIR)
+    quantizer.quantize(
+        save_dir=ONNX_QUANTIZED_DIR,
+        quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    )
+    tokenizer.save_pretrained(ONNX_QUANTIZED_DIR)
+    
+    print("--- ONNX Export Complete ---")
+    print(f"Int8 model saved to '{ONNX_QUANTIZED_DIR}'.")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
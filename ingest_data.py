@@ -1,56 +1,151 @@
-import chromadb
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import SentenceTransformerEmbeddings # <-- CORRECTED
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import torch
+from tqdm import tqdm
+from sentence_transformers import SentenceTransformer
+from langchain_core.embeddings import Embeddings
 from langchain_text_splitters.character import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import TextLoader
 import os
 
 # Constants
 KNOWLEDGE_BASE_FILE = "knowledge_base.txt"
-CHROMA_PERSIST_DIR = "chroma_db"
-COLLECTION_NAME = "medical_knowledge"
+VECTOR_STORE_DIR = "vector_store"
+VECTORS_FILE = os.path.join(VECTOR_STORE_DIR, "vecs.npy")
+CHUNKS_FILE = os.path.join(VECTOR_STORE_DIR, "chunks.jsonl")
 EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 MODEL_CACHE_DIR = "model_cache"  # <-- We will still use this
+ENCODE_BATCH_SIZE = 256
+MAX_SEQ_LENGTH = 256  # MiniLM's trained limit; long enough for the 1000-character chunks
+TOKENIZER_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+PREFETCH_BATCHES = 8  # Tokenized batches allowed in flight ahead of the model
+
+_tokenizer = None
+
+def _init_tokenizer(tokenizer):
+    global _tokenizer
+    _tokenizer = tokenizer
+
+def _tokenize_with(tokenizer, texts):
+    return dict(tokenizer(
+        texts,
+        padding=True,
+        truncation=True,
+        max_length=MAX_SEQ_LENGTH,
+        return_tensors="np"
+    ))
+
+def _tokenize(texts):
+    """Tokenizes one batch of chunks. Runs in a worker process."""
+    return _tokenize_with(_tokenizer, texts)
+
+class BatchSentenceTransformerEmbeddings(Embeddings):
+    """
+    Thin wrapper around a SentenceTransformer that encodes documents in large,
+    normalized batches (FP16 on CUDA) instead of the library defaults.
+    
+    Tokenization runs in a process pool a few batches ahead of the model, so
+    the CPU-bound tokenizer overlaps with the forward passes.
+    """
+
+    def __init__(self, model_name, cache_folder=None, batch_size=ENCODE_BATCH_SIZE):
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.model = SentenceTransformer(model_name, cache_folder=cache_folder, device=device)
+        # Also applies to model.encode, so embed_query truncates like the batch path
+        self.model.max_seq_length = MAX_SEQ_LENGTH
+        if device == "cuda":
+            self.model.half()
+        self.batch_size = batch_size
+
+    def _forward(self, features):
+        features = {name: torch.from_numpy(value).to(self.model.device) for name, value in features.items()}
+        with torch.inference_mode():
+            embeddings = self.model(features)["sentence_embedding"]
+        return torch.nn.functional.normalize(embeddings.float(), dim=1).cpu().numpy()
+
+    def embed_documents(self, texts):
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        vecs = []
+        with tqdm(total=len(texts), desc="Encoding chunks") as progress:
+            def consume(features):
+                vecs.append(self._forward(features))
+                progress.update(len(vecs[-1]))
+            
+            if len(batches) <= 1:
+                # Nothing to overlap with a single batch, so skip the pool startup
+                for batch in batches:
+                    consume(_tokenize_with(self.model.tokenizer, batch))
+            else:
+                pending = deque()
+                with ProcessPoolExecutor(
+                    max_workers=TOKENIZER_WORKERS,
+                    initializer=_init_tokenizer,
+                    initargs=(self.model.tokenizer,)
+                ) as ex:
+                    for batch in batches:
+                        pending.append(ex.submit(_tokenize, batch))
+                        if len(pending) >= PREFETCH_BATCHES:
+                            consume(pending.popleft().result())
+                    while pending:
+                        consume(pending.popleft().result())
+        if not vecs:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return np.concatenate(vecs)
+
+    def embed_query(self, text):
+        return self.model.encode([text], convert_to_numpy=True, normalize_embeddings=True)[0]
 
 def main():
     print("--- Starting Data Ingestion Process ---")
     
     try:
-        loader = TextLoader(KNOWLEDGE_BASE_FILE, encoding="utf-8")
-        documents = loader.load()
+        with open(KNOWLEDGE_BASE_FILE, encoding="utf-8") as f:
+            raw = f.read()
         print(f"Successfully loaded '{KNOWLEDGE_BASE_FILE}'.")
     except Exception as e:
         print(f"Error loading knowledge base file: {e}")
         return
         
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    texts = text_splitter.split_documents(documents)
-    print(f"Split document into {len(texts)} chunks.")
+    chunks = text_splitter.split_text(raw)
+    print(f"Split document into {len(chunks)} chunks.")
     
     print(f"Loading embedding model: '{EMBEDDING_MODEL_NAME}'...")
     
     if not os.path.exists(MODEL_CACHE_DIR):
         os.makedirs(MODEL_CACHE_DIR)
             
-    # Use the correct class with the cache_folder argument
-    embedding_function = SentenceTransformerEmbeddings(
+    # Use the cache_folder argument to avoid the permission error
+    embedding_function = BatchSentenceTransformerEmbeddings(
         model_name=EMBEDDING_MODEL_NAME,
-        cache_folder=MODEL_CACHE_DIR  # <-- This fixes the permission error
+        cache_folder=MODEL_CACHE_DIR
     )
-    print("Embedding model loaded.")
+    print(f"Embedding model loaded on '{embedding_function.model.device}'.")
     
-    print(f"Creating/loading persistent vector store at '{CHROMA_PERSIST_DIR}'...")
+    # Encode every chunk once, up front, as one contiguous float32 matrix
+    vecs = np.ascontiguousarray(embedding_function.embed_documents(chunks), dtype=np.float32)
+    print(f"Encoded {len(vecs)} chunks.")
     
-    db = Chroma.from_documents(
-        documents=texts,
-        embedding=embedding_function,
-        persist_directory=CHROMA_PERSIST_DIR,
-        collection_name=COLLECTION_NAME
-    )
+    print(f"Creating persistent vector store at '{VECTOR_STORE_DIR}'...")
+    
+    if not os.path.exists(VECTOR_STORE_DIR):
+        os.makedirs(VECTOR_STORE_DIR)
+    
+    # Unit-length vectors make inner product equal to cosine similarity
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    # Stored as a little-endian float16 .npy (a raw buffer behind a small shape/dtype
+    # header) so main.py can memory-map it read-only on any platform
+    np.save(VECTORS_FILE, vecs.astype("<f2"))
+    
+    # Line i holds the text of row i in the index
+    with open(CHUNKS_FILE, "w", encoding="utf-8") as f:
+        for chunk in chunks:
+            f.write(json.dumps(chunk) + "\n")
     
     print("--- Data Ingestion Complete ---")
-    print(f"Vector store created with {db._collection.count()} documents.")
-    print(f"Database saved to '{CHROMA_PERSIST_DIR}'.")
+    print(f"Vector store created with {len(vecs)} documents of dimension {vecs.shape[1]}.")
+    print(f"Vectors saved to '{VECTORS_FILE}', chunks to '{CHUNKS_FILE}'.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,37 +1,32 @@
 import os
+import json
+import functools
+from contextlib import asynccontextmanager
 import uvicorn
 import asyncio
+import httpx
+import numpy as np
+import onnxruntime as ort
 from fastapi import FastAPI, Response # <-- Import Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import AsyncGenerator
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import SentenceTransformerEmbeddings
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_community.chat_models import ChatOllama
 from langchain_core.prompts import PromptTemplate
 from starlette.responses import StreamingResponse
-from deep_translator import GoogleTranslator
-
-#--- FastAPI App Initialization ---
-app = FastAPI(
-    title="Al Medical Chatbot API",
-    description="An API for a private, locally-run Al medical diagnosis and analysis chatbot.",
-    version="1.0.0",
-)
-
-#--- CORS Middleware (Updated to be more explicit) ---
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"], # Allows all origins (including your GitHub page and localhost)
-    allow_credentials=True,
-    allow_methods=["POST", "GET", "OPTIONS"], # Explicitly allow all methods
-    allow_headers=["*"], # Explicitly allow all headers
-)
+from deep_translator.constants import GOOGLE_LANGUAGES_TO_CODES
+from optimum.onnxruntime import ORTModelForFeatureExtraction
+from transformers import AutoTokenizer
 
 #--- Global Variables (Initialized on Startup) ---
+embedding_function = None
 vector_store = None
 llm = None
 prompt_template = None
+http_client = None
 
 #--- Pydantic Models for Request/Response ---
 class ChatRequest(BaseModel):
@@ -43,34 +38,176 @@ class TranslationRequest(BaseModel):
     source_lang: str = "auto"
 
 #--- Constants ---
-CHROMA_PERSIST_DIR = "chroma_db"
-COLLECTION_NAME = "medical_knowledge"
+VECTOR_STORE_DIR = "vector_store"
+VECTORS_FILE = os.path.join(VECTOR_STORE_DIR, "vecs.npy")
+CHUNKS_FILE = os.path.join(VECTOR_STORE_DIR, "chunks.jsonl")
 EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2" 
-MODEL_CACHE_DIR = "model_cache"
+EMBEDDING_DIM = 384
+MAX_SEQ_LENGTH = 128 # Queries only; they are typically one sentence. Chunks use 256 at ingest
+SCORE_BLOCK_ROWS = 16384
+ONNX_MODEL_DIR = "onnx_model_int8" # Created by export_model.py
+ONNX_MODEL_FILE = "model_quantized.onnx"
 LLM_MODEL_NAME = "phi3:mini" 
+QUERY_EMBEDDING_CACHE_SIZE = 4096
+# Same variable uvicorn's own CLI reads for --workers, so both entrypoints agree
+SERVER_WORKERS = max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+# Every worker runs its own ONNX Runtime session, so with several workers each
+# session gets a single thread instead of oversubscribing the CPU
+ORT_INTRA_OP_THREADS = 1 if SERVER_WORKERS > 1 else max(1, (os.cpu_count() or 2) // 2)
+GOOGLE_TRANSLATE_URL = "https://translate.googleapis.com/translate_a/single"
+GOOGLE_TRANSLATE_MAX_CHARS = 5000
 
-#--- Application Startup Event ---
-@app.on_event("startup")
-def startup_event():
-    global vector_store, llm, prompt_template
-    print("--- Server starting up: Initializing RAG components ---")
+#--- Translation ---
+GOOGLE_LANGUAGE_CODES = set(GOOGLE_LANGUAGES_TO_CODES.values())
+_translation_params: dict[tuple[str, str], dict[str, str]] = {}
+
+def _resolve_language(lang: str) -> str:
+    # Accept codes ("mr") or names ("marathi"), as GoogleTranslator did
+    if lang == "auto" or lang in GOOGLE_LANGUAGE_CODES:
+        return lang
+    if lang in GOOGLE_LANGUAGES_TO_CODES:
+        return GOOGLE_LANGUAGES_TO_CODES[lang]
+    raise ValueError(f"Language '{lang}' is not supported by Google Translate.")
+
+def _get_translation_params(source: str, target: str) -> dict[str, str]:
+    # Resolved once per language pair; only supported pairs are cached
+    key = (source, target)
+    if key not in _translation_params:
+        _translation_params[key] = {
+            "client": "gtx",
+            "sl": _resolve_language(source),
+            "tl": _resolve_language(target),
+            "dt": "t",
+        }
+    return _translation_params[key]
+
+async def google_translate(client: httpx.AsyncClient, text: str, source: str, target: str) -> str:
+    # Same checks GoogleTranslator.translate made before calling Google: length
+    # must be under the limit, and the text is stripped before everything else
+    if len(text) >= GOOGLE_TRANSLATE_MAX_CHARS:
+        raise ValueError(
+            f"Text is too long to translate ({len(text)} characters, "
+            f"must be under {GOOGLE_TRANSLATE_MAX_CHARS})."
+        )
+    base_params = _get_translation_params(source, target)
+    text = text.strip()
+    if not text or base_params["sl"] == base_params["tl"]:
+        return text
     
-    if not os.path.exists(CHROMA_PERSIST_DIR):
-        print(f"Error: ChromaDB directory '{CHROMA_PERSIST_DIR}' not found.")
-        return
+    params = {**base_params, "q": text}
+    response = await client.get(GOOGLE_TRANSLATE_URL, params=params)
+    response.raise_for_status()
+    # The first element holds [translated, original, ...] for each sentence,
+    # and is null when Google had nothing to translate
+    segments = response.json()[0] or []
+    return "".join(segment[0] for segment in segments if segment[0])
 
-    embedding_function = SentenceTransformerEmbeddings(
-        model_name=EMBEDDING_MODEL_NAME,
-        cache_folder=MODEL_CACHE_DIR
-    )
+#--- Query Embeddings ---
+class OnnxSentenceEmbeddings(Embeddings):
+    """
+    all-MiniLM-L6-v2 exported to ONNX, dynamically quantized to int8, and run
+    on ONNX Runtime's CPU provider.
+    Mean pooling and L2 normalization reproduce the SentenceTransformer
+    pipeline used by ingest_data.py, so query and chunk vectors match.
+    """
+
+    def __init__(self, model_dir, file_name=None):
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session_options.intra_op_num_threads = ORT_INTRA_OP_THREADS
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            model_dir,
+            file_name=file_name,
+            provider="CPUExecutionProvider",
+            session_options=session_options,
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+    def _encode(self, texts):
+        inputs = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=MAX_SEQ_LENGTH,
+            return_tensors="np"
+        )
+        hidden = self.model(**inputs).last_hidden_state
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return (pooled / np.linalg.norm(pooled, axis=1, keepdims=True)).astype(np.float32, copy=False)
+
+    def embed_documents(self, texts):
+        return self._encode(texts).tolist()
+
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
+
+    def embed_query_array(self, text):
+        """Returns the unit-length query vector as a read-only float32 array."""
+        vec = self._encode([text])[0]
+        vec.setflags(write=False)
+        return vec
+
+#--- Vector Store ---
+class MemmapVectorStore:
+    """
+    Read-only store over the normalized float16 embedding matrix written by
+    ingest_data.py. The matrix is memory-mapped, so it lives in the OS page
+    cache (shared between processes) rather than in each process's heap.
+    Chunk texts are kept in a parallel list (row i of the matrix is chunk i).
+    """
+
+    def __init__(self, vectors_path, chunks_path, dim=EMBEDDING_DIM):
+        # The .npy header carries the shape and little-endian dtype; no parsing of the data itself
+        self.vecs = np.load(vectors_path, mmap_mode="r")
+        if self.vecs.dtype != np.dtype("<f2") or self.vecs.ndim != 2 or self.vecs.shape[1] != dim:
+            raise ValueError(
+                f"Unexpected vector file {vectors_path}: {self.vecs.dtype} {self.vecs.shape}, "
+                f"expected little-endian float16 (n, {dim}). Re-run ingest_data.py."
+            )
+        with open(chunks_path, encoding="utf-8") as f:
+            self.page_contents = [json.loads(line) for line in f]
+
+    def _scores(self, q):
+        # numpy has no BLAS float16 kernel, so upcast one block of rows at a time
+        # and score it with a float32 sgemv; temporaries stay bounded by the block
+        scores = np.empty(len(self.vecs), dtype=np.float32)
+        for start in range(0, len(self.vecs), SCORE_BLOCK_ROWS):
+            block = self.vecs[start:start + SCORE_BLOCK_ROWS].astype(np.float32)
+            np.matmul(block, q, out=scores[start:start + len(block)])
+        return scores
+
+    def similarity_search_by_vector(self, embedding, k=4):
+        """
+        Returns the k chunks closest to embedding, which must be unit length
+        (as OnnxSentenceEmbeddings produces). Rows are normalized at ingest,
+        so every score is a cosine similarity.
+        """
+        k = min(k, len(self.vecs))
+        if k == 0:
+            return []
+        scores = self._scores(np.asarray(embedding, dtype=np.float32))
+        # O(n) selection of the top k, then order just those k by score
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(-scores[top])]
+        return [Document(page_content=self.page_contents[i]) for i in top]
+
+#--- Application Lifespan ---
+def _load_embeddings():
+    global embedding_function, vector_store
+    embedding_function = OnnxSentenceEmbeddings(ONNX_MODEL_DIR, file_name=ONNX_MODEL_FILE)
+    # Pay the one-time session allocation cost here instead of on the first /chat
+    embedding_function.embed_query("warmup")
+    print(f"Embedding model '{EMBEDDING_MODEL_NAME}' (int8) loaded with ONNX Runtime.")
     
-    vector_store = Chroma(
-        persist_directory=CHROMA_PERSIST_DIR,
-        embedding_function=embedding_function,
-        collection_name=COLLECTION_NAME,
+    vector_store = MemmapVectorStore(
+        vectors_path=VECTORS_FILE,
+        chunks_path=CHUNKS_FILE,
     )
     print("Vector store loaded.")
-    
+
+def _load_llm():
+    global llm, prompt_template
     template = """
 You are ArogyaAi, an AI medical assistant developed by Gunaji. Your role is to provide helpful, safe, and evidence-based medical information.
 Your answers should be helpful but concise.
@@ -88,9 +225,58 @@ Answer:
 """
     prompt_template = PromptTemplate(template=template, input_variables=["context", "question"])
     
-    llm = ChatOllama(model=LLM_MODEL_NAME)
+    # keep_alive=-1 pins the model in Ollama's memory between requests
+    llm = ChatOllama(model=LLM_MODEL_NAME, keep_alive=-1)
+    try:
+        # Loads the model in Ollama, and prefilling the static system preamble leaves it
+        # in Ollama's prompt cache, so each /chat only has to prefill its own context and question.
+        # num_predict=1 stops after the prefill instead of generating a full answer.
+        warmup_llm = ChatOllama(model=LLM_MODEL_NAME, keep_alive=-1, num_predict=1)
+        warmup_llm.invoke(template.split("{context}")[0])
+    except Exception as e:
+        print(f"LLM warmup failed (is Ollama running?): {e}")
     print(f"LLM '{LLM_MODEL_NAME}' initialized.")
-    print("--- RAG components successfully initialized. Server is ready. ---")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global http_client
+    print("--- Server starting up: Initializing RAG components ---")
+    
+    # Shared keep-alive client for /translate, independent of the RAG components
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    )
+    
+    if not os.path.exists(VECTORS_FILE):
+        print(f"Error: Vector file '{VECTORS_FILE}' not found. Run ingest_data.py first.")
+    elif not os.path.exists(ONNX_MODEL_DIR):
+        print(f"Error: ONNX model directory '{ONNX_MODEL_DIR}' not found. Run export_model.py first.")
+    else:
+        # The two loads are independent, so overlap them
+        await asyncio.gather(asyncio.to_thread(_load_embeddings), asyncio.to_thread(_load_llm))
+        print("--- RAG components successfully initialized. Server is ready. ---")
+    
+    yield
+    
+    await http_client.aclose()
+
+#--- FastAPI App Initialization ---
+app = FastAPI(
+    title="Al Medical Chatbot API",
+    description="An API for a private, locally-run Al medical diagnosis and analysis chatbot.",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+
+#--- CORS Middleware (Updated to be more explicit) ---
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"], # Allows all origins (including your GitHub page and localhost)
+    allow_credentials=True,
+    allow_methods=["POST", "GET", "OPTIONS"], # Explicitly allow all methods
+    allow_headers=["*"], # Explicitly allow all headers
+)
 
 #--- API Endpoints ---
 
@@ -109,6 +295,18 @@ async def translate_options():
 def read_root():
     return {"status": "ok", "message": "Al Medical Chatbot API is running."}
 
+# MiniLM's tokenizer is uncased, so lower-casing the key does not change the embedding
+def _normalize_query(query: str) -> str:
+    return query.strip().lower()
+
+@functools.lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+def _embed_query(norm_query: str) -> np.ndarray:
+    # Read-only float32 array (~1.5 KB), so a cached vector cannot be modified by a caller
+    return embedding_function.embed_query_array(norm_query)
+
+def _retrieve(query: str, k: int) -> list[Document]:
+    return vector_store.similarity_search_by_vector(_embed_query(_normalize_query(query)), k=k)
+
 async def stream_chat_response(query: str) -> AsyncGenerator[str, None]:
     if not vector_store:
         error_message = "Vector store is not initialized. Please check server startup logs."
@@ -117,14 +315,15 @@ async def stream_chat_response(query: str) -> AsyncGenerator[str, None]:
         
     try:
         print(f"Searching for context for: '{query}'")
-        retrieved_docs = await vector_store.asimilarity_search(query, k=5)
+        # An SSE comment flushes the response headers before retrieval starts;
+        # clients (including script.js) ignore it
+        yield ": retrieving context\n\n"
+        retrieved_docs = await asyncio.to_thread(_retrieve, query, 5)
         
         if not retrieved_docs:
             print("No relevant context found in the database.")
             no_context_message = "I do not have enough information about that topic to provide an answer. Disclaimer: I am an Al assistant and not a substitute for professional medical advice. Please consult a qualified healthcare provider for any health concerns."
-            for char in no_context_message:
-                yield f"data: {char}\n\n"
-                await asyncio.sleep(0.01) 
+            yield f"data: {no_context_message}\n\n"
             return
 
         print(f"Found {len(retrieved_docs)} relevant documents.")
@@ -151,9 +350,8 @@ async def chat(request: ChatRequest):
 @app.post("/translate", summary="Translate text using Google Translate")
 async def translate_text(request: TranslationRequest):
     try:
-        result = await asyncio.to_thread(
-            GoogleTranslator(source=request.source_lang, target=request.target_lang).translate,
-            request.text
+        result = await google_translate(
+            http_client, request.text, request.source_lang, request.target_lang
         )
         return {"translated_text": result}
     except Exception as e:
@@ -162,4 +360,11 @@ async def translate_text(request: TranslationRequest):
 
 if __name__ == "__main__":
     print("--- Starting server directly (via main.py) ---")
-    uvicorn.run(app, host="127.0.0.1", port=8000)
\ No newline at end of file
+    # An import string is required for multiple workers. uvicorn's default "auto"
+    # loop/http settings pick uvloop and httptools when they are installed.
+    uvicorn.run(
+        "main:app",
+        host="127.0.0.1",
+        port=8000,
+        workers=SERVER_WORKERS,
+    )
\ No newline at end of file
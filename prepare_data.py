@@ -1,57 +1,88 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pypdf import PdfReader
 
 # Directory containing the source PDF documents
 PDF_SOURCE_DIR = "medical_data"
 # File to save the extracted text
 OUTPUT_TEXT_FILE = "knowledge_base.txt"
+# Write buffer size, large enough to amortize syscalls across many pages
+WRITE_BUFFER_SIZE = 1 << 20
 
-def extract_text_from_pdfs(pdf_dir):
+def _extract(path):
     """
-    Extracts text from all PDF files in a given directory.
+    Extracts the text of a single PDF file. Runs in a worker process.
+    
+    Args:
+        path (str): The path to the PDF file.
+    
+    Returns:
+        tuple: (pages, error) where pages is a list of non-empty page texts
+        and exactly one of the two is None.
+    """
+    try:
+        reader = PdfReader(path)
+        pages = [page.extract_text() for page in reader.pages]
+        return [text for text in pages if text], None
+    except Exception as e:
+        return None, str(e)
+
+def extract_text_from_pdfs(pdf_dir, output_file):
+    """
+    Extracts text from all PDF files in a given directory, one file per worker
+    process, and streams it into output_file as each file's results arrive.
+    
+    The text is written to a temporary file first, so an existing output_file
+    is only replaced when some text was actually extracted.
     
     Args:
         pdf_dir (str): The path to the directory containing PDF files.
+        output_file (str): The path of the text file to write.
     
     Returns:
-        str: A single string containing all the extracted text.
+        int: The number of characters written to output_file.
     """
-    all_text = ""
     print(f"Scanning for PDF files in '{pdf_dir}'...")
     if not os.path.exists(pdf_dir):
         print(f"Error: Directory '{pdf_dir}' not found. Please create it and add your medical PDFs.")
-        return ""
+        return 0
     
     pdf_files = [f for f in os.listdir(pdf_dir) if f.lower().endswith(".pdf")]
     if not pdf_files:
         print(f"No PDF files found in '{pdf_dir}'.")
-        return ""
+        return 0
     
     print(f"Found {len(pdf_files)} PDF(s). Extracting text...")
     
-    for filename in pdf_files:
-        path = os.path.join(pdf_dir, filename)
-        try:
-            reader = PdfReader(path)
-            for page in reader.pages:
-                text = page.extract_text()
-                if text:
-                    all_text += text + "\n\n" # Add space between pages
+    paths = [os.path.join(pdf_dir, filename) for filename in pdf_files]
+    tmp_file = output_file + ".tmp"
+    total_chars = 0
+    with open(tmp_file, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as f, \
+            ProcessPoolExecutor(max_workers=os.cpu_count()) as ex:
+        for filename, (pages, error) in zip(pdf_files, ex.map(_extract, paths, chunksize=1)):
+            if error is not None:
+                print(f" - Could not read {filename}: {error}")
+                continue
+            for text in pages:
+                f.write(text)
+                f.write("\n\n") # Add space between pages
+                total_chars += len(text) + 2
             print(f" - Successfully extracted text from {filename}")
-        except Exception as e:
-            print(f" - Could not read {filename}: {e}")
-    return all_text
+    
+    if total_chars:
+        os.replace(tmp_file, output_file)
+    else:
+        os.remove(tmp_file)
+    return total_chars
 
 def main():
     """
     Main function to run the data preparation process.
     """
-    extracted_text = extract_text_from_pdfs(PDF_SOURCE_DIR)
-    if extracted_text:
-        with open(OUTPUT_TEXT_FILE, "w", encoding="utf-8") as f:
-            f.write(extracted_text)
+    total_chars = extract_text_from_pdfs(PDF_SOURCE_DIR, OUTPUT_TEXT_FILE)
+    if total_chars:
         print(f"\nSuccessfully extracted and saved text to '{OUTPUT_TEXT_FILE}'.")
-        print(f"Total characters extracted: {len(extracted_text)}")
+        print(f"Total characters extracted: {total_chars}")
     else:
         print("\nNo text was extracted. Exiting.")
 